@@ -36,11 +36,17 @@ ENV (overrides):
   ADMIN_TOKEN=********          # para /admin/provision si lo querés exponer (no expuesto por defecto)
 """
 
-import os, json, html, base64
+import os, gzip, base64, hashlib, queue, threading, time
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, Any, List, Optional
+import orjson
 from flask import Flask, jsonify, Response, redirect, request
-from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
+from jsonschema import ValidationError
+
+from bus_client import RabbitClient, envelope_bytes
+from schemas import ENVELOPE as ENVELOPE_SCHEMA, SCHEMAS, validate_envelope
 
 # ---------- Broker base (pruebas visibles) ----------
 BROKER_HOST   = os.getenv("BROKER_HOST", "leopard.lmq.cloudamqp.com")
@@ -48,6 +54,8 @@ BROKER_VHOST  = os.getenv("BROKER_VHOST", "smqbzeze")
 BROKER_USER   = os.getenv("BROKER_USERNAME", "smqbzeze")
 BROKER_PASS   = os.getenv("BROKER_PASSWORD", "xlgdZM_NyZk8akZuWpUTDWpEb-16G4mf")
 EXCHANGE_NAME = os.getenv("EXCHANGE_NAME", "tolling.bus")
+# Prefetch recomendado para consumers (1 es una trampa de throughput)
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", "100"))
 RABBIT_URL    = os.getenv("RABBIT_URL") or os.getenv("RABBITMQ_URL") or f"amqps://{BROKER_USER}:{BROKER_PASS}@{BROKER_HOST}/{BROKER_VHOST}"
 
 # ---------- Catálogo de eventos (embebido; se puede overridear) ----------
@@ -229,19 +237,22 @@ DOCS_MODULES_DEFAULT = {
 def _load_json(env_json: str, env_path: str, default_obj: Dict[str, Any]) -> Dict[str, Any]:
   js = os.getenv(env_json)
   if js:
-    try: return json.loads(js)
+    try: return orjson.loads(js)
     except Exception: pass
   p = os.getenv(env_path)
   if p and os.path.exists(p):
     try:
-      with open(p, "r", encoding="utf-8") as f:
-        return json.load(f)
+      with open(p, "rb") as f:
+        return orjson.loads(f.read())
     except Exception:
       pass
   return default_obj
 
-EVENTS   = _load_json("EVENTS_CATALOG_JSON", "EVENTS_CATALOG_PATH", EVENTS_DEFAULT)
-DOCS_CFG = _load_json("DOCS_MODULES_JSON", "DOCS_MODULES_PATH", DOCS_MODULES_DEFAULT)
+# Catálogos read-only (mismo criterio que schemas.py con SCHEMAS): todo lo
+# precomputado al importar (bloques de eventos, tarjetas por módulo, página
+# de docs) asume que estos dicts no cambian después del boot.
+EVENTS   = MappingProxyType(_load_json("EVENTS_CATALOG_JSON", "EVENTS_CATALOG_PATH", EVENTS_DEFAULT))
+DOCS_CFG = MappingProxyType(_load_json("DOCS_MODULES_JSON", "DOCS_MODULES_PATH", DOCS_MODULES_DEFAULT))
 
 # ---------- Tokens (prueba) y usuarios por módulo ----------
 TOKENS_DEFAULT = {
@@ -263,8 +274,8 @@ USERS_DEFAULT = {
   "M7": {"username":"m7_test","password":"m7_test_pass"},
   "M8": {"username":"m8_test","password":"m8_test_pass"}
 }
-MODULE_TOKENS = json.loads(os.getenv("MODULE_TOKENS_JSON", json.dumps(TOKENS_DEFAULT)))
-MODULE_USERS  = json.loads(os.getenv("MODULE_USERS_JSON",  json.dumps(USERS_DEFAULT)))
+MODULE_TOKENS = orjson.loads(os.getenv("MODULE_TOKENS_JSON")) if os.getenv("MODULE_TOKENS_JSON") else TOKENS_DEFAULT
+MODULE_USERS  = orjson.loads(os.getenv("MODULE_USERS_JSON"))  if os.getenv("MODULE_USERS_JSON")  else USERS_DEFAULT
 USE_SHARED    = os.getenv("USE_SHARED_ACCOUNT", "true").lower() == "true"
 
 def _policy_for_module(mod_code: str) -> Dict[str, Any]:
@@ -285,17 +296,181 @@ def _policy_for_module(mod_code: str) -> Dict[str, Any]:
 def _amqp_url(user: str, pwd: str) -> str:
   return f"amqps://{user}:{pwd}@{BROKER_HOST}/{BROKER_VHOST}"
 
+def _build_credentials_payload(mod_code: str) -> Dict[str, Any]:
+  if USE_SHARED:
+    u, p = BROKER_USER, BROKER_PASS
+  else:
+    creds = MODULE_USERS.get(mod_code) or {}
+    u, p = creds.get("username"), creds.get("password")
+    if not u or not p:
+      # fallback a shared si faltan
+      u, p = BROKER_USER, BROKER_PASS
+  policy = _policy_for_module(mod_code)
+  return {
+    "module": mod_code,
+    "amqp_url": _amqp_url(u, p),
+    "host": BROKER_HOST,
+    "vhost": BROKER_VHOST,
+    "username": u,
+    "password": p,
+    "exchange": EXCHANGE_NAME,
+    "queue_suggested": f"{mod_code.lower()}.q" if policy["consume"] else None,
+    "policy": policy
+  }
+
+# Todo el payload de credenciales es estático desde el boot: se serializa una
+# vez por módulo y el endpoint queda en un lookup por token + memcpy.
+# Indexado por sha256(token): lookup O(1) sin comparar el token en claro
+# (la comparación de digests no filtra prefijos por timing).
+def _token_key(token: str) -> bytes:
+  return hashlib.sha256(token.encode("utf-8")).digest()
+
+_CREDS_BY_TOKEN: Dict[bytes, bytes] = {
+  _token_key(tok): orjson.dumps(_build_credentials_payload(code)) for code, tok in MODULE_TOKENS.items()
+}
+_VALID_TOKEN_KEYS = frozenset(_CREDS_BY_TOKEN)
+
 # ---------- Web ----------
+class ORJSONProvider(DefaultJSONProvider):
+  # Serialización C para todas las respuestas jsonify (3-5x más rápida que stdlib)
+  def dumps(self, obj, **kwargs):
+    return orjson.dumps(obj).decode("utf-8")
+  def loads(self, s, **kwargs):
+    return orjson.loads(s)
+
 app = Flask(__name__)
-CORS(app, resources={r"*": {"origins": ["*"]}})
+app.json = ORJSONProvider(app)
+
+# La política CORS es un wildcard fijo: un set de header por respuesta en vez
+# del hook de flask-cors (matcheo de patrones por request para el mismo "*").
+@app.after_request
+def _cors(resp):
+  resp.headers["Access-Control-Allow-Origin"] = "*"
+  resp.headers["Access-Control-Allow-Headers"] = "Content-Type, X-Module-Token"
+  return resp
+
+# Conexión Rabbit persistente del proceso (una por worker de gunicorn).
+RB = RabbitClient(RABBIT_URL, EXCHANGE_NAME)
+
+# Cola acotada + thread publicador: el request HTTP solo valida y encola,
+# el I/O contra el broker queda fuera del thread del worker (backpressure vía 503).
+# Cada item es la tanda entera de un request; maxsize cuenta requests aceptados.
+PUB_Q: "queue.Queue" = queue.Queue(maxsize=int(os.getenv("PUBLISH_QUEUE_MAX", "10000")))
+
+PUB_BATCH_MAX = int(os.getenv("PUBLISH_BATCH_MAX", "32"))
+
+def _drain_publisher():
+  while True:
+    # Cada item de la cola es la tanda completa de un request (admisión
+    # todo-o-nada). Junta hasta PUB_BATCH_MAX mensajes disponibles y confirma
+    # todo con un solo commit (amortiza el RTT en vez de un ack por mensaje).
+    batch = list(PUB_Q.get())
+    entries = 1
+    while len(batch) < PUB_BATCH_MAX:
+      try:
+        batch.extend(PUB_Q.get_nowait())
+      except queue.Empty:
+        break
+      entries += 1
+    try:
+      if not RB.publish_batch(batch):
+        app.logger.warning("Tanda con mensajes no ruteables (%d msgs)", len(batch))
+    except Exception as e:
+      app.logger.error("Publish de tanda falló (%d msgs): %s", len(batch), e)
+    finally:
+      for _ in range(entries):
+        PUB_Q.task_done()
+
+def _start_bus_threads():
+  # Warm-up en background: el handshake TLS+AMQP y el exchange_declare corren
+  # al boot, no en el primer publish ni en ningún probe de /health.
+  threading.Thread(target=_drain_publisher, daemon=True, name="bus-publisher").start()
+  threading.Thread(target=RB.ensure_ready, daemon=True, name="bus-warmup").start()
+
+_start_bus_threads()
+
+def _reinit_after_fork():
+  # Si este módulo se importó antes del fork (preload_app u otro runner),
+  # el hijo hereda el FD AMQP del padre pero ninguno de los threads daemon:
+  # sin esto, PUB_Q se llena sin drenador e is_connected() miente. Cada
+  # proceso rearma su cliente y sus threads.
+  RB.reset_after_fork()
+  _start_bus_threads()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
 
 @app.get("/")
 def _root():
   return redirect("/docs", code=302)
 
+# Payload inmutable desde el boot: se serializa una sola vez y el handler
+# devuelve siempre la misma Response (evita jsonify + make_response por request).
+# dict(...) porque los exporta read-only (MappingProxyType) y orjson no los serializa
+_SCHEMAS_BODY = orjson.dumps({"envelope": dict(ENVELOPE_SCHEMA), "events": sorted(SCHEMAS.keys()),
+                              "schemas": dict(SCHEMAS), "consumer_prefetch": CONSUMER_PREFETCH})
+
+@app.get("/schemas")
+def _schemas():
+  return Response(_SCHEMAS_BODY, mimetype="application/json")
+
+# Spec mínima de la API HTTP, también bytes precomputados (misma técnica que
+# /schemas: payload estático desde el boot, cero serialización por request).
+_OPENAPI_BYTES = orjson.dumps({
+  "openapi": "3.0.3",
+  "info": {"title": "Tolling Service Bus", "version": "1.0.0",
+           "description": "Credenciales por módulo y publicación de eventos sobre RabbitMQ."},
+  "paths": {
+    "/docs": {"get": {"summary": "Documentación HTML del bus",
+                      "responses": {"200": {"description": "Página de documentación"}}}},
+    "/schemas": {"get": {"summary": "Envelope y esquemas JSON de todos los eventos",
+                         "responses": {"200": {"description": "Esquemas"}}}},
+    "/health": {"get": {"summary": "Liveness barato (estado local)",
+                        "responses": {"200": {"description": "Estado del servicio"}}}},
+    "/ready": {"get": {"summary": "Readiness: verifica broker y exchange",
+                       "responses": {"200": {"description": "Listo"}, "503": {"description": "Broker inaccesible"}}}},
+    "/auth/credentials": {"post": {"summary": "Canjea token de módulo por credenciales AMQP",
+                                   "responses": {"200": {"description": "Credenciales + policy"},
+                                                 "401": {"description": "Token inválido"}}}},
+    "/bus/publish": {"post": {"summary": "Publica envelope(s) validados en el exchange",
+                              "parameters": [{"name": "mandatory", "in": "query",
+                                              "schema": {"type": "string", "enum": ["1"]},
+                                              "description": "Opt-in al chequeo de ruteo (basic.return)"}],
+                              "responses": {"202": {"description": "Encolado"},
+                                            "401": {"description": "Token inválido"},
+                                            "422": {"description": "Envelope inválido"},
+                                            "503": {"description": "Cola de publicación llena"}}}},
+  },
+})
+
+@app.get("/openapi.json")
+def _openapi():
+  return Response(_OPENAPI_BYTES, mimetype="application/json")
+
+# Los probes (Render/k8s) pegan cada pocos segundos: se cachea la respuesta
+# por HEALTH_TTL_S y el chequeo de broker es solo estado local (sin RPC AMQP).
+_HEALTH_TTL = float(os.getenv("HEALTH_TTL_S", "1"))
+_health_cache = {"until": 0.0, "body": b""}
+
 @app.get("/health")
 def _health():
-  return jsonify({"status":"ok","time":datetime.utcnow().isoformat()+"Z","rabbit_url_present":bool(RABBIT_URL)})
+  now = time.monotonic()
+  if now >= _health_cache["until"]:
+    _health_cache["body"] = orjson.dumps({
+      "status": "ok",
+      "time": datetime.utcnow().isoformat() + "Z",
+      "rabbit_url_present": bool(RABBIT_URL),
+      "broker_connected": RB.is_connected(),
+    })
+    _health_cache["until"] = now + _HEALTH_TTL
+  return Response(_health_cache["body"], mimetype="application/json")
+
+@app.get("/ready")
+def _ready():
+  # Probe pesado y explícito: verifica broker de verdad (conexión + exchange).
+  # /health queda como liveness barato en memoria.
+  if RB.ensure_ready():
+    return jsonify({"ready": True})
+  return jsonify({"ready": False}), 503
 
 # ---------- Auth API: exchange token → credentials + policy ----------
 @app.post("/auth/credentials")
@@ -319,47 +494,124 @@ def issue_credentials():
   if not token:
     return jsonify({"error":"missing_token"}), 400
 
-  # Buscar módulo por token
-  mod_code = None
-  for k, v in MODULE_TOKENS.items():
-    if v == token:
-      mod_code = k
-      break
-  if not mod_code:
+  body = _CREDS_BY_TOKEN.get(_token_key(token))
+  if body is None:
     return jsonify({"error":"invalid_token"}), 401
-
-  # Credenciales
-  if USE_SHARED:
-    u, p = BROKER_USER, BROKER_PASS
-  else:
-    creds = MODULE_USERS.get(mod_code) or {}
-    u, p = creds.get("username"), creds.get("password")
-    if not u or not p:
-      # fallback a shared si faltan
-      u, p = BROKER_USER, BROKER_PASS
-
-  policy = _policy_for_module(mod_code)
-  payload = {
-    "module": mod_code,
-    "amqp_url": _amqp_url(u, p),
-    "host": BROKER_HOST,
-    "vhost": BROKER_VHOST,
-    "username": u,
-    "password": p,
-    "exchange": EXCHANGE_NAME,
-    "queue_suggested": f"{mod_code.lower()}.q" if policy["consume"] else None,
-    "policy": policy
-  }
-  return jsonify(payload)
+  return Response(body, mimetype="application/json")
+
+# ---------- Publish API: publicar al bus vía HTTP ----------
+# Cuerpos de respuesta preformateados: el camino de éxito no llama a ninguna
+# librería JSON (solo un % sobre bytes) y los errores son constantes del boot.
+_PUB_OK_TMPL      = b'{"ok":true,"queued":true,"routing_key":%b}'
+_ERR_MISSING_TOKEN = b'{"error":"missing_token"}'
+_ERR_INVALID_TOKEN = b'{"error":"invalid_token"}'
+_ERR_INVALID_JSON  = b'{"error":"invalid_json"}'
+_ERR_QUEUE_FULL    = b'{"error":"publish_queue_full"}'
+_ERR_TOO_LARGE     = b'{"error":"payload_too_large"}'
+
+# Tope de body: corta payloads gigantes antes de parsear/validar (memoria acotada)
+_MAX_BODY = int(os.getenv("PUBLISH_MAX_BYTES", str(256 * 1024)))
+
+def _json_resp(body: bytes, status: int = 200) -> Response:
+  return Response(body, status=status, mimetype="application/json")
+
+# Memoización de reintentos por digest del body, no por los bytes crudos:
+# lru_cache sobre raw retenía clave + valor de hasta _MAX_BODY cada uno, y
+# cualquier poseedor de token podía llenarlo variando un byte por request
+# (~GiB por worker en el peor caso). La clave ahora pesa 32 bytes fijos,
+# solo se cachean bodies chicos (los reintentos típicos) y el tope de
+# entradas acota la memoria total a unos pocos MiB.
+_PARSE_CACHE_BODY_MAX = int(os.getenv("PUBLISH_CACHE_BODY_MAX", "16384"))
+_PARSE_CACHE_ENTRIES = 1024
+_parse_cache: Dict[bytes, tuple] = {}
+_parse_cache_lock = threading.Lock()
+
+def _parse_validated(raw: bytes):
+  # Acepta un envelope o una lista de envelopes (publicación en tanda).
+  doc = orjson.loads(raw)
+  envelopes = doc if isinstance(doc, list) else (doc,)
+  items = []
+  for env in envelopes:
+    if not isinstance(env, dict):
+      raise ValidationError("El envelope debe ser un objeto JSON")
+    validate_envelope(env)
+    items.append((env["event"], envelope_bytes(env)))
+  if not items:
+    raise ValidationError("La tanda no puede ser vacía")
+  return tuple(items)
+
+def _parse_and_validate(raw: bytes):
+  # Los producers reintentan el mismo envelope byte a byte (misma
+  # correlation_id): el reintento queda en un hash + lookup de dict.
+  # Los inválidos levantan antes de cachearse, igual que con lru_cache.
+  if len(raw) > _PARSE_CACHE_BODY_MAX:
+    return _parse_validated(raw)
+  key = hashlib.sha256(raw).digest()
+  with _parse_cache_lock:
+    hit = _parse_cache.get(key)
+  if hit is not None:
+    return hit
+  items = _parse_validated(raw)
+  with _parse_cache_lock:
+    if len(_parse_cache) >= _PARSE_CACHE_ENTRIES:
+      # Reset simple: el tráfico caliente lo repuebla en un puñado de requests
+      _parse_cache.clear()
+    _parse_cache[key] = items
+  return items
+
+@app.post("/bus/publish")
+def http_publish():
+  """
+  Body JSON: envelope {"event","version","data","meta"}  +  Header X-Module-Token.
+  Publica en el exchange con routing_key = event (reusa la conexión persistente).
+  """
+  token = request.headers.get("X-Module-Token", "").strip()
+  if not token:
+    return _json_resp(_ERR_MISSING_TOKEN, 400)
+  if _token_key(token) not in _VALID_TOKEN_KEYS:
+    return _json_resp(_ERR_INVALID_TOKEN, 401)
+
+  # Guardas de tamaño: primero Content-Length declarado, después lectura con
+  # tope por si el cliente miente o usa chunked.
+  if request.content_length and request.content_length > _MAX_BODY:
+    return _json_resp(_ERR_TOO_LARGE, 413)
+  raw = request.stream.read(_MAX_BODY + 1)
+  if len(raw) > _MAX_BODY:
+    return _json_resp(_ERR_TOO_LARGE, 413)
+
+  # Parse directo de los bytes crudos con orjson: evita el get_json de Flask
+  # (chequeo de content-type, decode intermedio) en el camino caliente.
+  # Reintentos idénticos pegan en el cache de _parse_and_validate.
+  try:
+    items = _parse_and_validate(raw)
+  except orjson.JSONDecodeError:
+    return _json_resp(_ERR_INVALID_JSON, 400)
+  except ValidationError as e:
+    return _json_resp(b'{"error":"invalid_envelope","detail":%b}' % orjson.dumps(e.message), 422)
+
+  # mandatory opt-in (?mandatory=1): el default confía en la topología
+  # pre-declarada y no paga el chequeo de basic.return por mensaje.
+  mand = request.args.get("mandatory") == "1"
+  # Admisión todo-o-nada: la tanda del request entra como UN solo item de la
+  # cola. Encolar de a uno dejaba un prefijo ya aceptado cuando queue.Full
+  # cortaba a mitad de tanda, y el retry del cliente lo duplicaba.
+  try:
+    PUB_Q.put_nowait([(rk, body, mand) for rk, body in items])
+  except queue.Full:
+    return _json_resp(_ERR_QUEUE_FULL, 503)
+  if len(items) == 1:
+    return _json_resp(_PUB_OK_TMPL % orjson.dumps(items[0][0]), 202)
+  return _json_resp(b'{"ok":true,"queued":%d}' % len(items), 202)
 
 # ---------- HTML helpers ----------
-def _esc(s: str) -> str: return html.escape(str(s))
-def _code(obj: Any) -> str: return "<pre><code>"+_esc(json.dumps(obj, ensure_ascii=False, indent=2))+"</code></pre>"
-
-def _event_block(key: str) -> str:
-  ev = EVENTS.get(key)
-  if not ev:
-    return f"<div class='event missing'><b>Evento no definido</b>: <code>{_esc(key)}</code></div>"
+# Tabla precompilada: un solo pase O(n) en C, contra los 5 .replace()
+# encadenados de html.escape (cada uno copia el string entero).
+_HTML_TT = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+def _esc(s: str) -> str: return str(s).translate(_HTML_TT)
+def _code(obj: Any) -> str: return "<pre><code>"+_esc(orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode())+"</code></pre>"
+
+def _render_event_block(key: str) -> str:
+  ev = EVENTS[key]
   return f"""
     <div class="event">
       <div class="rk"><b>Routing key</b>: <code>{_esc(ev['routing_key'])}</code></div>
@@ -369,6 +621,21 @@ def _event_block(key: str) -> str:
     </div>
   """
 
+# Los bloques por evento (JSON de ejemplo indentado + escape) son estáticos:
+# se formatean una sola vez al importar en vez de por render.
+_EVENT_BLOCKS = {k: _render_event_block(k) for k in EVENTS}
+
+# Fallbacks para claves fuera del catálogo, memoizados por clave (un módulo
+# puede referenciar el mismo evento inexistente desde varias secciones).
+_MISSING_BLOCKS: Dict[str, str] = {}
+
+def _event_block(key: str) -> str:
+  block = _EVENT_BLOCKS.get(key)
+  if block is None:
+    return _MISSING_BLOCKS.setdefault(
+      key, f"<div class='event missing'><b>Evento no definido</b>: <code>{_esc(key)}</code></div>")
+  return block
+
 def _pub_snippet(amqp_url: str, rk: str, payload: Dict[str, Any]) -> str:
   return _esc(f"""# publisher.py
 import json, pika
@@ -377,11 +644,32 @@ params.heartbeat = 30
 conn = pika.BlockingConnection(params)
 ch = conn.channel()
 ch.exchange_declare(exchange="{EXCHANGE_NAME}", exchange_type="topic", durable=True)
-body = {json.dumps(payload, ensure_ascii=False, indent=2)}
-ch.basic_publish(exchange="{EXCHANGE_NAME}", routing_key="{rk}",
-                 body=json.dumps(body).encode("utf-8"),
-                 properties=pika.BasicProperties(content_type="application/json", delivery_mode=2))
-print("Published:", "{rk}")
+body = {orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()}
+
+# Dos niveles de publicación:
+# - crítico (pagos/multas): persistente + mandatory, el broker hace fsync
+# - bulk (log.app y similares): transitorio, sin mandatory — no paga disco
+PROPS_CRITICO = pika.BasicProperties(content_type="application/json", delivery_mode=2)
+PROPS_BULK    = pika.BasicProperties(content_type="application/json", delivery_mode=1)
+
+def publish_critical(rk, msg):
+    ch.basic_publish(exchange="{EXCHANGE_NAME}", routing_key=rk,
+                     body=json.dumps(msg).encode("utf-8"),
+                     properties=PROPS_CRITICO, mandatory=True)
+
+def publish_bulk(rk, msg):
+    ch.basic_publish(exchange="{EXCHANGE_NAME}", routing_key=rk,
+                     body=json.dumps(msg).encode("utf-8"),
+                     properties=PROPS_BULK)
+
+# Publicar en tandas y confirmar una sola vez por tanda: esperar el confirm
+# del broker mensaje a mensaje hunde el throughput (un RTT por publish).
+mensajes = [body]  # juntar hasta 50-200 mensajes por tanda
+ch.tx_select()
+for msg in mensajes:
+    publish_critical("{rk}", msg)
+ch.tx_commit()  # un solo round-trip confirma toda la tanda
+print("Published:", len(mensajes), "msg(s) rk={rk}")
 conn.close()""")
 
 def _sub_snippet(amqp_url: str, queue: str, rks: List[str]) -> str:
@@ -395,19 +683,24 @@ channel = conn.channel()
 channel.exchange_declare(exchange="{EXCHANGE_NAME}", exchange_type="topic", durable=True)
 channel.queue_declare(queue="{queue}", durable=True)
 {binds}
+procesados = [0]
 def on_msg(ch, method, props, body):
     print("rk=", method.routing_key, "msg=", body.decode())
-    ch.basic_ack(method.delivery_tag)
-channel.basic_qos(prefetch_count=50)
+    procesados[0] += 1
+    if procesados[0] % 50 == 0:
+        # ack por tandas: multiple=True confirma todo lo pendiente hasta acá
+        ch.basic_ack(method.delivery_tag, multiple=True)
+channel.basic_qos(prefetch_count={CONSUMER_PREFETCH})  # prefetch=1 hunde el throughput
 channel.basic_consume(queue="{queue}", on_message_callback=on_msg)
 print("Listening on {queue}...")
 channel.start_consuming()""")
 
-def _module_conn_card(mod: Dict[str, Any]) -> str:
+def _module_card_static(mod: Dict[str, Any]) -> str:
+  # Todo lo que no depende del request (snippets, bloques de eventos, colas):
+  # se arma una sola vez por módulo al importar.
   code  = mod["code"]
   pubs  = [EVENTS[k]["routing_key"] if k in EVENTS else k for k in mod.get("publishes", [])]
   subs  = [EVENTS[k]["routing_key"] if k in EVENTS else k for k in mod.get("subscribes", [])]
-  tok   = MODULE_TOKENS.get(code, "—")
   qname = f"{code.lower()}.q" if subs else None
   # ejemplo amqp_url mostrado con shared (para copy/paste rápido en pruebas)
   sample_user, sample_pass = (BROKER_USER, BROKER_PASS) if USE_SHARED else (MODULE_USERS.get(code,{}).get("username","<user>"), MODULE_USERS.get(code,{}).get("password","<pass>"))
@@ -428,6 +721,24 @@ def _module_conn_card(mod: Dict[str, Any]) -> str:
       <ul>{"".join(f"<li><code>{_esc(r)}</code></li>" for r in subs)}</ul>
       <details><summary>Snippet (consumer)</summary><pre>{_sub_snippet(sample_amqp, qname, subs)}</pre></details>
     """
+  streams = f"""
+    <div class="streams">
+      <div><h3>Publica</h3>{("".join(_event_block(k) for k in mod.get("publishes", [])) if mod.get("publishes") else "<p>No publica eventos.</p>")}</div>
+      <div><h3>Consume</h3>{("".join(_event_block(k) for k in mod.get("subscribes", [])) if mod.get("subscribes") else "<p>No consume eventos.</p>")}</div>
+    </div>
+  """
+  return pub_sample + sub_sample + streams
+
+# Parte estática de cada tarjeta, renderizada una sola vez al importar
+_MODULE_STATIC = {m["code"]: _module_card_static(m) for m in DOCS_CFG.get("modules", [])}
+
+def _module_conn_card(mod: Dict[str, Any]) -> str:
+  # Solo el bloque de credenciales depende del request (host del curl de ejemplo);
+  # el resto de la tarjeta sale del memo por módulo.
+  code = mod["code"]
+  tok  = MODULE_TOKENS.get(code, "—")
+  sample_user, sample_pass = (BROKER_USER, BROKER_PASS) if USE_SHARED else (MODULE_USERS.get(code,{}).get("username","<user>"), MODULE_USERS.get(code,{}).get("password","<pass>"))
+  sample_amqp = _amqp_url(sample_user, sample_pass)
   creds = f"""
     <div class="creds">
       <h4>Token de prueba del módulo</h4>
@@ -447,17 +758,43 @@ def _module_conn_card(mod: Dict[str, Any]) -> str:
       <p class="warn">Pruebas: credenciales visibles. En producción se emitirán usuarios/ACL por módulo.</p>
     </div>
   """
-  streams = f"""
-    <div class="streams">
-      <div><h3>Publica</h3>{("".join(_event_block(k) for k in mod.get("publishes", [])) if mod.get("publishes") else "<p>No publica eventos.</p>")}</div>
-      <div><h3>Consume</h3>{("".join(_event_block(k) for k in mod.get("subscribes", [])) if mod.get("subscribes") else "<p>No consume eventos.</p>")}</div>
-    </div>
-  """
-  return creds + pub_sample + sub_sample + streams
+  return creds + _MODULE_STATIC.get(code, "")
 
 # ---------- /docs ----------
+# La página es función pura de la config del boot (salvo el host del curl de
+# ejemplo, que se toma del primer request): se renderiza una vez y después es
+# un memcpy + chequeo de ETag.
+_DOCS_CACHE: Dict[str, Any] = {}
+# Con nginx adelante: DOCS_ACCEL_PATH hace que nginx sirva el archivo renderizado
+# vía sendfile(2) (X-Accel-Redirect), sin pasar los bytes por Python.
+DOCS_ACCEL_PATH = os.getenv("DOCS_ACCEL_PATH", "")
+DOCS_FILE_PATH  = os.getenv("DOCS_FILE_PATH", "/tmp/tolling_docs.html")
+
 @app.get("/docs")
 def docs():
+  if _DOCS_CACHE:
+    if request.headers.get("If-None-Match") == _DOCS_CACHE["etag"]:
+      return Response(status=304, headers={"ETag": _DOCS_CACHE["etag"]})
+    if DOCS_ACCEL_PATH:
+      return Response(b"", mimetype="text/html; charset=utf-8",
+                      headers={"X-Accel-Redirect": DOCS_ACCEL_PATH,
+                               "ETag": _DOCS_CACHE["etag"], "Cache-Control": "public, max-age=3600, immutable"})
+    headers = {"ETag": _DOCS_CACHE["etag"], "Cache-Control": "public, max-age=3600, immutable",
+               "Vary": "Accept-Encoding"}
+    # Variante gzip precomprimida (la página baja ~5x): cero CPU por request.
+    # direct_passthrough: los bytes cacheados van directo al WSGI sin que
+    # Flask los re-envuelva/copie; Content-Length explícito evita el len tardío.
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+      headers["Content-Encoding"] = "gzip"
+      headers["Content-Length"] = str(len(_DOCS_CACHE["gzip"]))
+      return Response(_DOCS_CACHE["gzip"], mimetype="text/html; charset=utf-8",
+                      headers=headers, direct_passthrough=True)
+    headers["Content-Length"] = str(len(_DOCS_CACHE["body"]))
+    return Response(_DOCS_CACHE["body"], mimetype="text/html; charset=utf-8",
+                    headers=headers, direct_passthrough=True)
+  return _render_docs()
+
+def _render_docs():
   CSS = """
   :root{--bg:#0f172a;--panel:#111827;--ink:#e5e7eb;--muted:#94a3b8;--accent:#22d3ee;--chip:#0b2430;--code:#0b1220;--border:#1f2937;--warn:#f59e0b}
   *{box-sizing:border-box} body{margin:0;background:var(--bg);color:var(--ink);font-family:ui-sans-serif,system-ui,Segoe UI,Roboto,Helvetica,Arial}
@@ -494,15 +831,18 @@ def docs():
     </ol>
   </section>
   """
-  modules_html = ""
+  # Lista de fragmentos + un solo join: evita el crecimiento O(N²) de ir
+  # concatenando strings módulo a módulo.
+  parts = []
   for m in DOCS_CFG.get("modules", []):
-    modules_html += f"""
+    parts.append(f"""
       <section class="module">
         <h2>{_esc(m.get('code','?'))} — {_esc(m.get('name_es',''))}</h2>
         <p class="summary">{_esc(m.get('summary_es',''))}</p>
         {_module_conn_card(m)}
       </section>
-    """
+    """)
+  modules_html = "".join(parts)
   html_doc = f"""<!doctype html><html lang="es"><head>
     <meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1"/>
     <title>Tolling Service Bus — Documentación</title>
@@ -514,7 +854,17 @@ def docs():
     <main><div class="wrap">{intro}{modules_html}</div></main>
     <footer>© Trabajo Práctico — Exchange: <code>{_esc(EXCHANGE_NAME)}</code></footer>
   </body></html>"""
-  return Response(html_doc, mimetype="text/html; charset=utf-8")
+  body = html_doc.encode("utf-8")
+  etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+  _DOCS_CACHE.update(body=body, etag=etag, gzip=gzip.compress(body, compresslevel=9))
+  try:
+    # Copia en disco para servir zero-copy detrás de nginx (X-Accel-Redirect)
+    with open(DOCS_FILE_PATH, "wb") as f:
+      f.write(body)
+  except OSError:
+    pass  # sin FS escribible se sigue sirviendo desde memoria
+  return Response(body, mimetype="text/html; charset=utf-8",
+                  headers={"ETag": etag, "Cache-Control": "public, max-age=3600, immutable"})
 
 # ---------- (Opcional) Provisionar usuarios/permisos en Rabbit vía HTTP API ----------
 def _http_provision_supported() -> bool:
@@ -572,4 +922,6 @@ def admin_provision():
 
 # ---------- Entry ----------
 if __name__ == "__main__":
-  app.run(host="0.0.0.0", port=int(os.getenv("PORT", "10000")))
+  # Solo para desarrollo local: en producción correr vía gunicorn (ver Procfile);
+  # el dev server es mono-thread por defecto y serializa todos los endpoints.
+  app.run(host="0.0.0.0", port=int(os.getenv("PORT", "10000")), threaded=True)
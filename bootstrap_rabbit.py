@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import json, os, sys, base64, time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
 CFG = json.load(open("config.json", "r", encoding="utf-8"))
@@ -20,8 +21,8 @@ def rq(method, path, data=None, ok=(200,201,202,204)):
                          headers={"content-type":"application/json"},
                          data=(json.dumps(data) if data is not None else None))
     if r.status_code not in ok:
-        print(f"[ERR] {method} {path} {r.status_code} {r.text}")
-        sys.exit(1)
+        # RuntimeError (no sys.exit) para que los errores salgan bien de los threads
+        raise RuntimeError(f"{method} {path} {r.status_code} {r.text}")
     return r
 
 def upsert_vhost():
@@ -51,49 +52,60 @@ def set_topic_permissions(u, write_re, read_re="^.*$"):
     rq("PUT", f"/topic-permissions/{VHOST}/{u}",
        {"exchange": EXCHANGE, "write": write_re, "read": read_re})
 
+def provision_module_topology(m):
+    q = m["queue"]
+    upsert_queue(q)
+    for rk in m["bindings"]:
+        bind(q, rk)
+
+    # DLQ queue (optional but recomendado)
+    dlq = f"{q}.dlq"
+    rq("PUT", f"/queues/{VHOST}/{dlq}", {"durable": True})
+    rq("POST", f"/bindings/{VHOST}/e/{DLX}/q/{dlq}", {"routing_key": ""})
+
+def provision_module_security(m):
+    u, p = m["username"], m["password"]
+    upsert_user(u, p)
+
+    # Restricciones: su cola, escribir solo en exchange, leer solo su cola
+    q = m["queue"]
+    set_permissions(
+        u,
+        configure_re=f"^{q}$",
+        write_re=f"^{EXCHANGE}$",
+        read_re=f"^{q}$"
+    )
+    # Topic-permissions: qué eventos puede publicar
+    if m["can_publish"]:
+        write_pat = "^(" + "|".join(map(lambda s: s.replace(".","\\."),
+                                        m["can_publish"])) + ")$"
+    else:
+        write_pat = "$^"  # nada
+    # Lectura: cinturón (permitir lo que ya bindemos)
+    if m["bindings"] == ["#"]:
+        read_pat = "^.*$"
+    else:
+        read_pat = "^(" + "|".join(map(lambda s: s.replace(".","\\.").replace("\\*",".*"),
+                                       m["bindings"])) + ")$"
+    set_topic_permissions(u, write_re=write_pat, read_re=read_pat)
+
 def main():
     print("[*] Applying topology and security to CloudAMQP…")
-    upsert_vhost()
-    upsert_exchanges()
-
-    # queues + bindings
-    for name, m in CFG["modules"].items():
-        q = m["queue"]
-        upsert_queue(q)
-        for rk in m["bindings"]:
-            bind(q, rk)
-
-        # DLQ queue (optional but recomendado)
-        dlq = f"{q}.dlq"
-        rq("PUT", f"/queues/{VHOST}/{dlq}", {"durable": True})
-        rq("POST", f"/bindings/{VHOST}/e/{DLX}/q/{dlq}", {"routing_key": ""})
-
-    # users + permissions
-    for name, m in CFG["modules"].items():
-        u, p = m["username"], m["password"]
-        upsert_user(u, p)
-
-        # Restricciones: su cola, escribir solo en exchange, leer solo su cola
-        q = m["queue"]
-        set_permissions(
-            u,
-            configure_re=f"^{q}$",
-            write_re=f"^{EXCHANGE}$",
-            read_re=f"^{q}$"
-        )
-        # Topic-permissions: qué eventos puede publicar
-        if m["can_publish"]:
-            write_pat = "^(" + "|".join(map(lambda s: s.replace(".","\\."),
-                                            m["can_publish"])) + ")$"
-        else:
-            write_pat = "$^"  # nada
-        # Lectura: cinturón (permitir lo que ya bindemos)
-        if m["bindings"] == ["#"]:
-            read_pat = "^.*$"
-        else:
-            read_pat = "^(" + "|".join(map(lambda s: s.replace(".","\\.").replace("\\*",".*"),
-                                           m["bindings"])) + ")$"
-        set_topic_permissions(u, write_re=write_pat, read_re=read_pat)
+    try:
+        upsert_vhost()
+        upsert_exchanges()
+
+        # Un HTTP round-trip por entidad; los módulos son independientes entre
+        # sí, así que colas/bindings y usuarios/permisos se aprovisionan en
+        # paralelo (pasa de N×RTT seriales a ~RTT con el pool)
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            for fut in [ex.submit(provision_module_topology, m) for m in CFG["modules"].values()]:
+                fut.result()
+            for fut in [ex.submit(provision_module_security, m) for m in CFG["modules"].values()]:
+                fut.result()
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        sys.exit(1)
 
     print("[OK] Topología y permisos aplicados.")
     print(f"    vhost: {VHOST}")
@@ -0,0 +1,308 @@
+# bus_client.py
+# Cliente Rabbit compartido: una conexión persistente por proceso.
+# Abrir/cerrar conexión por publish cuesta un handshake TCP+TLS+AMQP completo
+# (~150-200 ms) y castiga el CPU del broker; los canales en cambio son baratos.
+import os
+import queue
+import socket
+import threading
+import time
+from functools import lru_cache
+import orjson
+import pika
+
+POOL_SIZE = int(os.getenv("RABBIT_CHANNEL_POOL", "64"))
+
+# Propiedades compartidas por todos los publishes: pika no las muta, así que
+# un solo objeto evita construir (y encodear) BasicProperties por mensaje.
+_PROPS = pika.BasicProperties(content_type="application/json", delivery_mode=2)
+
+
+@lru_cache(maxsize=256)
+def _prefix(event: str, version: str) -> bytes:
+    # Parte fija del envelope serializada una sola vez por (event, version)
+    return b'{"event":' + orjson.dumps(event) + b',"version":' + orjson.dumps(version) + b',"data":'
+
+
+def envelope_bytes(envelope: dict) -> bytes:
+    """Serializa un envelope ya validado reusando el prefijo estático cacheado.
+
+    Solo es seguro porque validate_envelope ya garantizó la estructura
+    (event/version/data/meta, sin claves extra).
+    """
+    return (_prefix(envelope["event"], envelope["version"])
+            + orjson.dumps(envelope["data"])
+            + b',"meta":' + orjson.dumps(envelope["meta"]) + b'}')
+
+
+class RabbitClient:
+    """Publisher con BlockingConnection persistente y pool de canales.
+
+    OJO threading: BlockingConnection y sus canales NO son thread-safe — dos
+    threads haciendo I/O sobre la misma conexión corrompen el stream de
+    frames. El pool NO habilita publishes en paralelo: amortiza el costo de
+    abrir canal entre publishes secuenciales. Todo el I/O debe pasar de a un
+    thread a la vez; los probes (ensure_ready) se serializan con el thread
+    publicador vía _tx_lock. En gunicorn multi-worker cada proceso arma su
+    propia instancia.
+
+    Modelo de threading del servicio: el camino caliente no toma ningún lock —
+    los handlers HTTP solo encolan en la cola acotada y un único thread dueño
+    de la conexión drena y confirma por tandas (submit/complete desacoplados,
+    mismo efecto que un cliente async sin sumar asyncio/aio-pika al stack).
+    _lock solo protege la (re)conexión y el alta de canales, eventos fríos.
+    """
+
+    def __init__(self, url: str, exchange: str, exchange_type: str = "topic",
+                 heartbeat: int = 30, pool_size: int = POOL_SIZE):
+        self._url = url
+        self._exchange = exchange
+        self._exchange_type = exchange_type
+        # URLParameters se parsea una sola vez: la URL y el heartbeat no cambian,
+        # y reparsearla en cada reconexión bajo backoff es trabajo gratis.
+        self._params = pika.URLParameters(url)
+        self._params.heartbeat = heartbeat
+        # Detecta conexiones muertas a nivel TCP antes que el heartbeat AMQP
+        self._params.tcp_options = {"TCP_USER_TIMEOUT": 30_000}
+        # Acota el connect individual: sin esto un broker caído puede colgar
+        # el handshake más allá del deadline de _ensure_conn
+        self._params.socket_timeout = 5
+        self._pool_size = pool_size
+        self._lock = threading.Lock()          # protege conexión y alta de canales
+        self._conn_ready = threading.Event()   # seteado tras la primera conexión OK
+        self._conn = None
+        self._pool = queue.Queue(maxsize=pool_size)
+        self._channels = 0
+        self._unroutable = threading.local()
+        self._tx_lock = threading.Lock()
+        self._tx_ch = None
+        self._last_returned = None
+
+    def _on_return(self, ch, method, props, body):
+        # Tupla plana en vez de dict: cero allocations extra por mensaje devuelto;
+        # se formatea lazy solo si alguien consulta last_returned().
+        self._unroutable.flag = True
+        self._last_returned = (method.reply_code, method.reply_text, method.exchange, method.routing_key)
+
+    def ensure_ready(self) -> bool:
+        """Conecta (si hace falta) y declara el exchange. Para warm-up y /ready.
+
+        Toma _tx_lock primero: serializa el probe con el thread publicador,
+        para no intercalar el exchange_declare con una transacción en vuelo
+        sobre la misma conexión (BlockingConnection no tolera I/O concurrente).
+        Mismo orden de locks que publish_batch (_tx_lock -> _lock).
+        """
+        try:
+            with self._tx_lock:
+                with self._lock:
+                    self._ensure_conn()
+            self._conn_ready.set()
+            return True
+        except (pika.exceptions.AMQPError, OSError):
+            # pika deja pasar errores de socket tal cual (p.ej. gaierror si no
+            # resuelve el host del broker): también son "broker inaccesible".
+            return False
+
+    def is_connected(self) -> bool:
+        """Liveness barato: solo mira el estado local, sin RPC al broker."""
+        return self._conn is not None and self._conn.is_open
+
+    def last_returned(self):
+        """Último basic.return recibido, como dict legible (o None)."""
+        t = self._last_returned
+        if t is None:
+            return None
+        return {"reply_code": t[0], "reply_text": t[1], "exchange": t[2], "routing_key": t[3]}
+
+    def _ensure_conn(self, deadline_s: float = 5.0):
+        # Reintentos acotados por deadline total: un broker caído degrada el
+        # request a un 503 rápido en vez de clavar el worker (y el _lock que
+        # tiene tomado) en un backoff sin techo.
+        if self._conn is not None and self._conn.is_open:
+            return
+        self._drain_pool()
+        start = time.monotonic()
+        delay = 0.1
+        while True:
+            try:
+                self._conn = pika.BlockingConnection(self._params)
+                break
+            except (pika.exceptions.AMQPConnectionError, OSError):
+                remaining = deadline_s - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise
+                time.sleep(min(delay, remaining))
+                delay *= 2
+        self._tune_socket()
+        ch = self._conn.channel()
+        ch.exchange_declare(exchange=self._exchange, exchange_type=self._exchange_type, durable=True)
+        ch.close()
+
+    def _tune_socket(self):
+        # Frames AMQP chicos (envelopes de cientos de bytes) + confirms: Nagle
+        # puede sumar decenas de ms de cola por publish contra un broker WAN/TLS.
+        # Best-effort: toca el socket interno del adapter si está accesible.
+        try:
+            sock = self._conn._impl.socket
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 256 * 1024)
+        except (AttributeError, OSError):
+            pass
+
+    def _new_channel(self):
+        ch = self._conn.channel()
+        ch.confirm_delivery()
+        ch.add_on_return_callback(self._on_return)
+        return ch
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        # Arranque en frío: un solo thread hace el handshake (CAS sobre el lock);
+        # el resto espera el Event en vez de apilarse detrás del mutex durante
+        # los segundos que tarda el connect TLS+AMQP.
+        if not self._conn_ready.is_set():
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._ensure_conn()
+                    self._conn_ready.set()
+                finally:
+                    self._lock.release()
+            else:
+                self._conn_ready.wait(timeout=10)
+        with self._lock:
+            self._ensure_conn()
+            if self._channels < self._pool_size:
+                self._channels += 1
+                return self._new_channel()
+        return self._pool.get()
+
+    def _release(self, ch):
+        if ch is not None and ch.is_open:
+            self._pool.put(ch)
+        else:
+            with self._lock:
+                self._channels -= 1
+
+    def _drain_pool(self):
+        while True:
+            try:
+                self._pool.get_nowait()
+                self._channels -= 1
+            except queue.Empty:
+                break
+
+    def publish(self, routing_key: str, body: bytes, mandatory: bool = False) -> bool:
+        """Publica tomando un canal del pool; un reintento si el broker cortó.
+
+        mandatory es opt-in: la topología se pre-declara al boot, así que el
+        caso común no paga el chequeo de basic.return por mensaje. Solo los
+        callers que piden verificación de ruteo (CLI, ?mandatory=1) lo activan.
+
+        No valida: el contrato es que el caller ya pasó por validate_envelope
+        (la validación corre exactamente una vez por mensaje, en el borde).
+        """
+        assert isinstance(body, (bytes, bytearray)), "publish espera el envelope ya serializado"
+        for attempt in (1, 2):
+            ch = None
+            try:
+                ch = self._acquire()
+                try:
+                    ch.basic_publish(self._exchange, routing_key, body, _PROPS,
+                                     mandatory=mandatory)
+                except pika.exceptions.UnroutableError as e:
+                    # Los canales del pool están en confirm mode: el basic.return
+                    # de un mandatory llega como excepción (no via _on_return).
+                    # Mensaje sin destino != problema de conexión: sin reintento.
+                    m = e.messages[0].method
+                    self._last_returned = (m.reply_code, m.reply_text, m.exchange, m.routing_key)
+                    self._release(ch)
+                    return False
+                except pika.exceptions.NackError:
+                    # El broker nackeó el confirm (p.ej. cola saturada): tampoco
+                    # es un corte de conexión, reportar el fallo al caller.
+                    self._release(ch)
+                    return False
+                self._release(ch)
+                return True
+            except pika.exceptions.AMQPError:
+                if ch is not None:
+                    self._release(ch)
+                with self._lock:
+                    if self._conn is not None and not self._conn.is_open:
+                        self._conn = None
+                        self._conn_ready.clear()
+                if attempt == 2:
+                    raise
+
+    def publish_batch(self, items) -> bool:
+        """Publica una tanda [(routing_key, body, mandatory), ...] con un commit.
+
+        Usa un canal transaccional dedicado (tx y confirms son excluyentes por
+        canal): N publishes + un tx_commit = un solo RTT al broker por tanda,
+        en vez de un ack sincrónico por mensaje.
+
+        mandatory viaja por ítem; los basic.return (si algún ítem lo pidió) se
+        barren una sola vez al final de la tanda, no por mensaje.
+
+        Igual que publish(): los bodies llegan validados y serializados.
+        """
+        with self._tx_lock:
+            for attempt in (1, 2):
+                try:
+                    if self._tx_ch is None or not self._tx_ch.is_open:
+                        with self._lock:
+                            self._ensure_conn()
+                        self._tx_ch = self._conn.channel()
+                        self._tx_ch.add_on_return_callback(self._on_return)
+                        self._tx_ch.tx_select()
+                    self._unroutable.flag = False
+                    any_mandatory = False
+                    for rk, body, mandatory in items:
+                        any_mandatory |= mandatory
+                        self._tx_ch.basic_publish(self._exchange, rk, body, _PROPS, mandatory=mandatory)
+                    self._tx_ch.tx_commit()
+                    if any_mandatory:
+                        # Drena los basic.return pendientes de toda la tanda
+                        self._conn.process_data_events(time_limit=0)
+                        return not self._unroutable.flag
+                    return True
+                except pika.exceptions.AMQPError:
+                    self._tx_ch = None
+                    with self._lock:
+                        if self._conn is not None and not self._conn.is_open:
+                            self._conn = None
+                            self._conn_ready.clear()
+                    if attempt == 2:
+                        raise
+
+    def reset_after_fork(self):
+        """Descarta el estado heredado por fork, sin tocar la red.
+
+        El FD AMQP pertenece al proceso padre: cerrarlo acá mandaría frames
+        por su socket. Se recrean también locks y Event, que pudieron quedar
+        tomados por otro thread en el momento del fork.
+        """
+        self._lock = threading.Lock()
+        self._tx_lock = threading.Lock()
+        self._conn_ready = threading.Event()
+        self._conn = None
+        self._pool = queue.Queue(maxsize=self._pool_size)
+        self._channels = 0
+        self._tx_ch = None
+        self._unroutable = threading.local()
+        self._last_returned = None
+
+    def close(self):
+        with self._lock:
+            self._drain_pool()
+            try:
+                if self._conn is not None and self._conn.is_open:
+                    self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+            self._conn_ready.clear()
+            self._channels = 0
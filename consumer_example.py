@@ -1,7 +1,8 @@
 # publish_m2_min.py
 # deps: pip install requests pika
 
-import os, json, time, requests, pika
+import os, time, requests, pika
+import orjson
 
 # Config de PRUEBA (podés overridear con env vars)
 SERVICE_URL = os.getenv("SERVICE_URL", "https://tolling-service-bus.onrender.com")
@@ -25,7 +26,7 @@ def publish(amqp_url: str, exchange: str, routing_key: str, payload: dict) -> No
     ch.basic_publish(
         exchange=exchange,
         routing_key=routing_key,
-        body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        body=orjson.dumps(payload),  # bytes UTF-8 en un solo paso, sin str intermedia
         properties=pika.BasicProperties(content_type="application/json", delivery_mode=2),
     )
     print(f"OK published rk={routing_key} payload={payload}")
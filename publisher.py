@@ -1,12 +1,13 @@
 # publisher.py
-import os, json, sys, argparse
-import pika
-from jsonschema import validate
-from schemas import ENVELOPE as ENVELOPE_SCHEMA, SCHEMAS
+import os, sys, argparse
+import orjson
+from bus_client import RabbitClient, envelope_bytes
+from schemas import validate_envelope
 
 def load_cfg():
     path = os.environ.get("BUS_CONFIG","config.json")
-    cfg = json.load(open(path,"r",encoding="utf-8"))
+    with open(path, "rb") as f:
+        cfg = orjson.loads(f.read())
     if os.environ.get("RABBIT_URL"):
         cfg["rabbitmq"]["url"] = os.environ["RABBIT_URL"]
     return cfg
@@ -17,26 +18,25 @@ def main():
     ap.add_argument("--routing-key", help="si se omite, usa event del envelope")
     args = ap.parse_args()
 
-    env = json.load(open(args.file,"r",encoding="utf-8"))
-    validate(env, ENVELOPE_SCHEMA)
+    with open(args.file, "rb") as f:
+        env = orjson.loads(f.read())
+    validate_envelope(env)
     evt = env["event"]
-    validate(env["data"], SCHEMAS[evt])
-
-    cfg = load_cfg()
-    params = pika.URLParameters(cfg["rabbitmq"]["url"])
-    conn = pika.BlockingConnection(params)
-    ch = conn.channel()
-    ch.confirm_delivery()
-    unroutable = {"flag": False}
-    def _on_return(ch, method, props, body): unroutable.update(flag=True)
-    ch.add_on_return_callback(_on_return)
 
+    # Invariante del bus: routing_key == event. Cortar acá evita pagar el RTT
+    # al broker para enterarse por basic.return de que el mensaje no rutea.
     rk = args.routing_key or evt
-    ok = ch.basic_publish(cfg["rabbitmq"]["exchange"], rk, json.dumps(env).encode("utf-8"),
-                          pika.BasicProperties(content_type="application/json", delivery_mode=2),
-                          mandatory=True)
-    conn.close()
-    if not ok or unroutable["flag"]:
+    if rk != evt:
+        print(f"routing_key ({rk}) debe coincidir con event ({evt})", file=sys.stderr)
+        sys.exit(2)
+
+    cfg = load_cfg()
+    rb = RabbitClient(cfg["rabbitmq"]["url"], cfg["rabbitmq"]["exchange"],
+                      exchange_type=cfg["rabbitmq"].get("exchange_type", "topic"))
+    # CLI de prueba: acá sí queremos saber si el mensaje no rutea
+    ok = rb.publish(rk, envelope_bytes(env), mandatory=True)
+    rb.close()
+    if not ok:
         print("PUBLISH FAILED", file=sys.stderr)
         sys.exit(1)
     print("OK", rk)
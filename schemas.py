@@ -1,4 +1,12 @@
 # schemas.py
+import hashlib, importlib.util, os, pathlib, re, sys
+from types import MappingProxyType
+import fastjsonschema
+import orjson
+from jsonschema import ValidationError
+
+__all__ = ["ENVELOPE", "SCHEMAS", "KNOWN_EVENTS", "validate_envelope", "check_envelope"]
+
 ENVELOPE = {
     "type": "object",
     "required": ["event", "version", "data", "meta"],
@@ -208,3 +216,99 @@ SCHEMAS = {
         "additionalProperties": False
     }
 }
+
+# Validadores precompilados con fastjsonschema (codegen una sola vez al importar;
+# valida con una función Python plana en vez de interpretar el árbol del esquema).
+# El código generado se cachea en disco keyed por sha256 del JSON canónico del
+# esquema: los reinicios calientes saltean el codegen y la invalidación es
+# automática cuando cambia el esquema (cambia el hash).
+_CACHE_DIR = pathlib.Path(os.getenv("SCHEMA_CACHE_DIR", ".cache/validators"))
+
+def _compile_cached(schema):
+    digest = hashlib.sha256(orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    path = _CACHE_DIR / f"{digest}.py"
+    try:
+        if not path.exists():
+            code = fastjsonschema.compile_to_code(schema)
+            _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(code, encoding="utf-8")
+            tmp.replace(path)
+        spec = importlib.util.spec_from_file_location(f"_validator_{digest}", path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod.validate
+    except Exception:
+        # Cache corrupto o FS read-only: compilar en memoria y seguir
+        return fastjsonschema.compile(schema)
+
+# Claves internadas: los lookups con literales del propio proceso resuelven
+# por identidad en el probe del dict (CPython cachea además el hash en el str).
+_DATA_VALIDATORS = {sys.intern(evt): _compile_cached(s) for evt, s in SCHEMAS.items()}
+
+# Eventos conocidos del bus: membership O(1) para rechazar temprano, también
+# exportado para que los clientes filtren antes de mandar.
+KNOWN_EVENTS = frozenset(_DATA_VALIDATORS)
+
+# Este módulo es el único dueño de los esquemas: exportarlos read-only evita
+# que otro código los mute y desincronice los validadores ya compilados.
+ENVELOPE = MappingProxyType(ENVELOPE)
+SCHEMAS = MappingProxyType(SCHEMAS)
+
+_ENVELOPE_KEYS = frozenset(("event", "version", "data", "meta"))
+# Pre-chequeo por claves: un par de comparaciones de sets rechaza extras y
+# faltantes en nanosegundos, sin entrar al validador compilado (que queda
+# para tipos/formatos). Solo aplica donde additionalProperties es False.
+_ALLOWED_KEYS = {evt: frozenset(s["properties"]) for evt, s in SCHEMAS.items()
+                 if s.get("additionalProperties") is False}
+_REQUIRED_KEYS = {evt: frozenset(s.get("required", ())) for evt, s in SCHEMAS.items()}
+# Chequeo liviano de fecha ISO-8601 (un regex compilado en vez del
+# format-checker genérico de RFC 3339)
+_ISO_DT = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+
+def _envelope_shape_error(envelope):
+    # Chequeo a mano del envelope (4 claves, tipos, meta requerida): unos pocos
+    # lookups de dict en vez de correr el JSON Schema completo por request.
+    # Devuelve el mensaje de error o None (sin excepciones: ver check_envelope).
+    if not isinstance(envelope, dict) or set(envelope) != _ENVELOPE_KEYS:
+        return "Envelope inválido: se esperan exactamente event/version/data/meta"
+    if not isinstance(envelope["event"], str) or not isinstance(envelope["version"], str):
+        return "Envelope inválido: event y version deben ser string"
+    if not isinstance(envelope["data"], dict):
+        return "Envelope inválido: data debe ser objeto"
+    meta = envelope["meta"]
+    if not isinstance(meta, dict) or not isinstance(meta.get("occurred_at"), str) \
+            or not isinstance(meta.get("producer"), str):
+        return "Envelope inválido: meta requiere occurred_at y producer (string)"
+    if _ISO_DT.match(meta["occurred_at"]) is None:
+        return "Envelope inválido: meta.occurred_at debe ser fecha-hora ISO-8601"
+    return None
+
+def check_envelope(envelope):
+    """Variante sin excepciones: devuelve (ok, error). Para consumers a line
+    rate, donde construir una excepción por mensaje malformado pesa en perfil."""
+    err = _envelope_shape_error(envelope)
+    if err is not None:
+        return False, err
+    evt = envelope["event"]
+    if evt not in KNOWN_EVENTS:
+        return False, f"Evento desconocido: {evt}"
+    data = envelope["data"]
+    keys = data.keys()
+    allowed = _ALLOWED_KEYS.get(evt)
+    if allowed is not None and not keys <= allowed:
+        return False, f"Campos no permitidos para {evt}: {', '.join(sorted(keys - allowed))}"
+    required = _REQUIRED_KEYS[evt]
+    if not required <= keys:
+        return False, f"Faltan campos requeridos para {evt}: {', '.join(sorted(required - keys))}"
+    try:
+        _DATA_VALIDATORS[evt](data)
+    except fastjsonschema.JsonSchemaException as e:
+        return False, e.message
+    return True, None
+
+def validate_envelope(envelope):
+    """Valida envelope + data contra el esquema del evento. Lanza ValidationError."""
+    ok, err = check_envelope(envelope)
+    if not ok:
+        raise ValidationError(err)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# serve.py — entrypoint de producción: gunicorn embebido con workers gevent.
+# Los endpoints calientes devuelven bytes precomputados; con workers async el
+# costo por request queda en el write al socket (sin serialización por GIL).
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+class BusServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Importar acá y no arriba: con preload_app=False gunicorn llama a
+        # load() en cada worker DESPUÉS del fork, así los side effects de
+        # app_bus (RabbitClient, thread de drenaje de PUB_Q, warm-up) viven
+        # en el proceso que atiende requests. Importado en el master, los
+        # threads daemon no sobreviven el fork: cada worker quedaría con una
+        # PUB_Q sin drenador (202 que no publican) y un FD AMQP heredado que
+        # /health reporta como conectado. Mismo contrato que el viejo
+        # `gunicorn app_bus:app`, que importaba el módulo post-fork.
+        from app_bus import app
+        return app
+
+
+if __name__ == "__main__":
+    BusServer({
+        "bind": f"0.0.0.0:{os.getenv('PORT', '10000')}",
+        "workers": int(os.getenv("WEB_CONCURRENCY", str(2 * multiprocessing.cpu_count() + 1))),
+        "worker_class": "gevent",
+        "keepalive": 30,
+        "preload_app": False,
+    }).run()
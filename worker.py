@@ -1,53 +1,148 @@
 # worker.py
-import os, json, time, logging
+import os, random, time, logging
 from typing import List
+import orjson
 import pika
+from schemas import check_envelope, KNOWN_EVENTS
 
 CFG_PATH = os.environ.get("BUS_CONFIG", "config.json")
-CFG = json.load(open(CFG_PATH, "r", encoding="utf-8"))
+with open(CFG_PATH, "rb") as _f:
+    CFG = orjson.loads(_f.read())
 if os.environ.get("RABBIT_URL"):
     CFG["rabbitmq"]["url"] = os.environ["RABBIT_URL"]
 
 RAB = CFG["rabbitmq"]
 TOPO = CFG["topology"]
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
-
-def _params():
-    p = pika.URLParameters(RAB["url"])
-    p.heartbeat = int(RAB.get("heartbeat", 30))
-    p.blocked_connection_timeout = int(RAB.get("blocked_timeout", 60))
-    return p
-
-def _ensure_topology(ch):
-    ch.exchange_declare(exchange=TOPO["dlx"], exchange_type="fanout", durable=True)
-    ch.exchange_declare(exchange=RAB["exchange"], exchange_type=RAB["exchange_type"], durable=True)
-    ttl = int(TOPO.get("ttl_ms", 604800000))
-    for q in TOPO["queues"]:
-        args = {"x-dead-letter-exchange": TOPO["dlx"], "x-message-ttl": ttl}
-        ch.queue_declare(queue=q["name"], durable=True, arguments=args)
-        for rk in q["bindings"]:
-            ch.queue_bind(queue=q["name"], exchange=RAB["exchange"], routing_key=rk)
-        dlq = f"{q['name']}.dlq"
+# Constantes y spec de topología precomputados al importar: evita rearmar los
+# dicts de argumentos y re-convertir ttl_ms en cada reconexión.
+EXCHANGE = RAB["exchange"]
+EXCHANGE_TYPE = RAB["exchange_type"]
+DLX = TOPO["dlx"]
+_TTL_MS = int(TOPO.get("ttl_ms", 604800000))
+_QUEUE_ARGS = {"x-dead-letter-exchange": DLX, "x-message-ttl": _TTL_MS}
+_QUEUE_SPEC = tuple((q["name"], tuple(q["bindings"]), f"{q['name']}.dlq") for q in TOPO["queues"])
+# prefetch=1 pierde ~70% de throughput; 64-100 es el rango sano. Configurable
+# por topología para que sea una política y no una constante enterrada.
+PREFETCH = int(TOPO.get("prefetch", 100))
+# Ack por tandas: un basic_ack(multiple=True) cada N mensajes en vez de un
+# frame por mensaje. Con el broker remoto, el RTT de los acks domina antes
+# que la validación; debe ser < PREFETCH para no auto-estrangular la ventana.
+ACK_EVERY = int(TOPO.get("ack_every", 32))
+ACK_FLUSH_S = 1.0  # flush periódico para no dejar tags colgados si baja el tráfico
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(message)s")
+# Evaluado una vez: el gate por mensaje es una carga de variable, no un
+# isEnabledFor por delivery.
+_LOG_INFO = logging.getLogger().isEnabledFor(logging.INFO)
+
+# Parseado una sola vez: URL/heartbeat/timeout no cambian y el loop de
+# reconexión con backoff no necesita re-correr el parser en cada intento.
+_PARAMS = pika.URLParameters(RAB["url"])
+_PARAMS.heartbeat = int(RAB.get("heartbeat", 30))
+_PARAMS.blocked_connection_timeout = int(RAB.get("blocked_timeout", 60))
+
+# Memo por proceso: una vez verificada/creada la topología (todo durable),
+# los ensure siguientes son un no-op en memoria.
+_topology_ready = False
+
+def _queue_exists(conn, name: str, dlq: str) -> bool:
+    # Probe passive en canal descartable: el NOT_FOUND cierra solo ese canal
+    probe = conn.channel()
+    try:
+        probe.queue_declare(queue=name, passive=True)
+        probe.queue_declare(queue=dlq, passive=True)
+        return True
+    except pika.exceptions.ChannelClosedByBroker:
+        return False
+    finally:
+        if probe.is_open:
+            probe.close()
+
+def _ensure_topology(conn, ch):
+    global _topology_ready
+    if _topology_ready:
+        return
+    ch.exchange_declare(exchange=DLX, exchange_type="fanout", durable=True)
+    ch.exchange_declare(exchange=EXCHANGE, exchange_type=EXCHANGE_TYPE, durable=True)
+    for name, bindings, dlq in _QUEUE_SPEC:
+        # passive primero, por cola: en el caso común (reconexión, todo durable
+        # ya existe) son 2 RPCs por cola en vez de declare + N binds + dlq.
+        if _queue_exists(conn, name, dlq):
+            continue
+        ch.queue_declare(queue=name, durable=True, arguments=_QUEUE_ARGS)
+        for rk in bindings:
+            ch.queue_bind(queue=name, exchange=EXCHANGE, routing_key=rk)
         ch.queue_declare(queue=dlq, durable=True)
-        ch.queue_bind(queue=dlq, exchange=TOPO["dlx"], routing_key="")
+        ch.queue_bind(queue=dlq, exchange=DLX, routing_key="")
+    _topology_ready = True
 
 def run_consumer(queue_names: List[str]):
     backoff = 1.0
     while True:
         try:
             logging.info("Connecting to Rabbit...")
-            conn = pika.BlockingConnection(_params())
+            conn = pika.BlockingConnection(_PARAMS)
             ch = conn.channel()
-            ch.basic_qos(prefetch_count=100)
-            _ensure_topology(ch)
+            ch.basic_qos(prefetch_count=PREFETCH)
+            _ensure_topology(conn, ch)
+
+            # Acks pendientes: tag más alto visto + cuántos acumulamos.
+            # Los delivery tags son monótonos por canal, así que un solo
+            # multiple=True confirma toda la tanda.
+            pending = {"tag": 0, "n": 0}
+
+            def _flush_acks():
+                if pending["n"]:
+                    ch.basic_ack(pending["tag"], multiple=True)
+                    pending["n"] = 0
+
+            def _tick():
+                _flush_acks()
+                conn.call_later(ACK_FLUSH_S, _tick)
 
             def on_msg(ch, method, props, body):
                 try:
-                    logging.info("[%s] %s", method.routing_key, body.decode("utf-8")[:2000])
-                    ch.basic_ack(method.delivery_tag)
+                    # Invariante del bus: routing_key == event. Tráfico con rk
+                    # desconocida se rechaza acá, antes de parsear el body
+                    # (cero allocations para basura/eventos viejos).
+                    if method.routing_key not in KNOWN_EVENTS:
+                        logging.warning("routing_key desconocida: %s", method.routing_key)
+                        _flush_acks()
+                        ch.basic_nack(method.delivery_tag, requeue=False)  # DLQ
+                        return
+                    # Validación con los validadores compilados de schemas.py,
+                    # vía check_envelope (sin excepciones: rechazar malformados
+                    # a line rate no construye un traceback por mensaje).
+                    # orjson parsea directo desde bytes (sin .decode() previo)
+                    try:
+                        msg = orjson.loads(body)
+                    except orjson.JSONDecodeError as e:
+                        logging.warning("JSON inválido [%s]: %s", method.routing_key, e)
+                        # flush antes del nack para mantener los tags monótonos
+                        _flush_acks()
+                        ch.basic_nack(method.delivery_tag, requeue=False)  # DLQ
+                        return
+                    ok, err = check_envelope(msg)
+                    if not ok:
+                        logging.warning("Mensaje inválido [%s]: %s", method.routing_key, err)
+                        _flush_acks()
+                        ch.basic_nack(method.delivery_tag, requeue=False)  # DLQ
+                        return
+                    # Decodificar solo el extracto (no el body entero) y solo
+                    # si el nivel INFO está habilitado: a line rate el decode
+                    # completo era la allocation más grande del happy path.
+                    if _LOG_INFO:
+                        logging.info("[%s] %s", method.routing_key,
+                                     body[:2000].decode("utf-8", "ignore"))
+                    pending["tag"] = method.delivery_tag
+                    pending["n"] += 1
+                    if pending["n"] >= ACK_EVERY:
+                        _flush_acks()
                 except Exception as e:
                     logging.exception("Handler error: %s", e)
+                    _flush_acks()
                     ch.basic_nack(method.delivery_tag, requeue=False)  # DLQ
 
             for q in queue_names:
@@ -55,12 +150,19 @@ def run_consumer(queue_names: List[str]):
                 logging.info("Consuming queue=%s", q)
 
             backoff = 1.0
+            conn.call_later(ACK_FLUSH_S, _tick)
             ch.start_consuming()
         except KeyboardInterrupt:
             break
+        except pika.exceptions.ProbableAuthenticationError as e:
+            # Error permanente: reintentar martilla al broker sin chance de éxito
+            logging.error("Credenciales rechazadas por el broker: %s", e)
+            raise SystemExit(1)
         except Exception as e:
             logging.warning("Consumer disconnected: %s", e)
-            time.sleep(min(backoff, 30))
+            # Jitter: sin él, todos los workers reconectan en sincronía después
+            # de una caída del broker (thundering herd sobre el handshake TLS)
+            time.sleep(min(backoff, 30) * (0.5 + random.random()))
             backoff *= 2
 
 if __name__ == "__main__":